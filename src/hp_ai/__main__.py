@@ -2,7 +2,7 @@ import json
 
 from dotenv import load_dotenv
 
-from . import api, cli, io
+from . import api, cli, io, journal, pipeline, profiling, sync
 
 # Load environment variables
 load_dotenv()
@@ -15,51 +15,126 @@ def main():
         print(f"Error: {e}")
         return
 
+    profiler = profiling.StageProfiler(cli_handler.get_profile_dir())
     document_manager = io.DocumentManager(cli_handler.get_document_folder())
     prompt_manager = io.PromptManager(cli_handler.get_prompt_file())
+    job_journal = journal.JobJournal(
+        cli_handler.get_journal_file(), resume=cli_handler.get_resume()
+    )
 
-    documents = document_manager.get_documents()
+    with profiler.stage("scan"):
+        documents = document_manager.get_documents()
 
     # Get user selections
-    try:
-        selected_documents = cli_handler.select_documents(documents)
-        selected_prompt_name = cli_handler.select_prompt(
-            prompt_manager.get_prompt_names()
-        )
-    except KeyboardInterrupt:
-        print("\nCancelled by user\n")
-        return
-    selected_prompt = prompt_manager.get_prompt(selected_prompt_name)
+    with profiler.stage("select"):
+        try:
+            selected_documents = cli_handler.select_documents(documents)
+            selected_prompt_name = cli_handler.select_prompt(
+                prompt_manager.get_prompt_names()
+            )
+        except KeyboardInterrupt:
+            print("\nCancelled by user\n")
+            return
+        if cli_handler.get_sweep():
+            prompts = prompt_manager.expand_sweep(selected_prompt_name)
+        else:
+            prompts = [({}, prompt_manager.get_prompt(selected_prompt_name))]
 
     # Display selections and confirm
     print(f"Selected documents: {selected_documents}")
-    print(f"Selected prompt: {selected_prompt}")
+    if len(prompts) == 1:
+        print(f"Selected prompt: {prompts[0][1]}")
+    else:
+        print(f"Selected prompt: {selected_prompt_name} ({len(prompts)} jobs)")
+
+    count = cli_handler.get_count()
+    with profiler.stage("scan"):
+        document_hashes = document_manager.get_document_hashes(selected_documents)
+
+    # Every selected document is combined with every prompt into a job, and
+    # the jobs of a document travel together until the document is uploaded
+    items = []
+    pending = 0
+    for filename, document_hash in zip(selected_documents, document_hashes):
+        jobs = []
+        for params, prompt in prompts:
+            job_id = journal.JobJournal.job_id(
+                [document_hash], prompt, {"count": count, **params}
+            )
+            label = f"{filename} {params}" if params else filename
+            if job_journal.reached(job_id, "posted"):
+                print(f"Skipping already uploaded job {label}")
+                continue
+            if not job_journal.reached(job_id, "generated"):
+                pending += 1
+            jobs.append({"job_id": job_id, "prompt": prompt, "label": label})
+        if jobs:
+            items.append({"filename": filename, "hash": document_hash, "jobs": jobs})
+    if not items:
+        print("All jobs have already been generated and uploaded")
+        return
 
-    if cli_handler.confirm_continue("Do you want to generate quiz questions?"):
+    client = None
+    if pending:
+        if not cli_handler.confirm_continue("Do you want to generate quiz questions?"):
+            return
         try:
             client = api.OpenAIClient()
         except Exception as e:
             print(f"Error initializing OpenAIClient: {e}")
             return
+    else:
+        print("Resuming from journal, using previously generated results")
 
-        for filename in selected_documents:
-            client.add_file(document_manager.get_document_path(filename))
+    workers = cli_handler.get_workers()
+    quiz_jobs = pipeline.QuizJobs(
+        document_manager,
+        job_journal,
+        count,
+        client,
+        progress=cli_handler.upload_progress,
+    )
+    summary = run_pipeline(quiz_jobs.stages(workers), items, profiler)
 
-        # Generate and display result
-        result = client.generate(selected_prompt)
-        json_result = json.loads(result)
-        pretty_result = json.dumps(json_result, indent=4, ensure_ascii=False)
+    quizzes = [json_result for job in summary.results for json_result in job["quizzes"]]
+    if quizzes:
+        pretty_result = json.dumps(
+            quizzes[0] if len(quizzes) == 1 else quizzes, indent=4, ensure_ascii=False
+        )
         print(pretty_result)
+    print(summary.format())
+    if not summary.results:
+        return
+
+    # Quizzes are only posted after they have been shown for review
+    if not cli_handler.confirm_continue(
+        "Do you want to upload the quizzes to the database?"
+    ):
+        print("Validated quizzes are kept in the job journal.")
+        print("Rerun with --resume to review and upload them later.")
+        return
+    try:
+        quiz_jobs.quiz_client = api.QuizAPIClient()
+    except Exception as e:
+        print(f"Error initializing QuizAPIClient: {e}")
+        return
+    quiz_jobs.manifest = sync.SyncManifest(
+        cli_handler.get_manifest_file(), quiz_jobs.quiz_client.api_route
+    )
+
+    summary = run_pipeline(quiz_jobs.post_stages(workers), summary.results, profiler)
+    print(summary.format())
+    sent = sum(job["sync"]["sent"] for job in summary.results)
+    skipped = sum(job["sync"]["skipped"] for job in summary.results)
+    print(f"Uploaded {sent} quizzes, skipped {skipped} already in the database")
+
 
-        if cli_handler.confirm_continue(
-            "Do you want to upload the quiz to the database?"
-        ):
-            try:
-                quizClient = api.QuizAPIClient()
-            except Exception as e:
-                print(f"Error initializing QuizAPIClient: {e}")
-                return
-            quizClient.create_quiz(json_result)
+def run_pipeline(stages, items, profiler):
+    quiz_pipeline = pipeline.Pipeline(stages)
+    if profiler.enabled:
+        # Stages run one after another so each stage profile only covers itself
+        return quiz_pipeline.run_sequential(items, profiler.stage)
+    return quiz_pipeline.run(items)
 
 
 if __name__ == "__main__":
@@ -67,3 +142,4 @@ if __name__ == "__main__":
         main()
     except KeyboardInterrupt:
         print("\nProcess interrupted by user.")
+        print("Completed steps are kept in the job journal, rerun with --resume.")
@@ -3,9 +3,32 @@ import os
 import requests
 from openai import OpenAI
 
+from .backends import BackendError, BackendRouter, default_backends
+from .io import ProgressFile, hash_file
+from .limits import UpstreamGuard
+from .quiz import canonical_hash, parse_quizzes
+
+# The output format lives here; the quiz category belongs in the prompt itself
+SYSTEM_PROMPT = (
+    "Du är en hjälpsam assistent som skapar quiz i JSON-format. "
+    "Returnera svaret i giltigt JSON-format med hjälp av funktionen create_quiz."
+)
+
+# Custom header carrying the quiz content hash. The quiz backend must store it
+# with the quiz and answer one of ALREADY_STORED, echoing the header, instead
+# of storing a duplicate. Without the echo these codes are ordinary errors
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+ALREADY_STORED = (304, 409, 412)
+
+
+class QuizAPIError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"API call failed with status code {status_code}")
+        self.status_code = status_code
+
 
 class OpenAIClient:
-    def __init__(self, api_key=None, model=None):
+    def __init__(self, api_key=None, model=None, backends=None, hedge=None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OpenAI API key is required")
@@ -13,29 +36,54 @@ class OpenAIClient:
         self.model = model or os.getenv("MODEL_NAME", "gpt-4o-mini")
         self.client = OpenAI(api_key=self.api_key)
         self.file_id_list = []
+        self.file_cache = {}
+        # Listing and uploading have very different latencies, so each gets its
+        # own limiter
+        self.list_files_guard = UpstreamGuard("openai-files-list")
+        self.upload_guard = UpstreamGuard("openai-files-upload")
 
-    def add_file(self, path: str):
+        if hedge is None:
+            hedge = os.getenv("HEDGE_REQUESTS", "false").lower() in ("1", "true", "yes")
+        self.router = BackendRouter(
+            backends or default_backends(self.client, self.model),
+            hedge=hedge,
+            hedge_delay=float(os.getenv("HEDGE_DELAY", 15.0)),
+        )
+
+    def add_file(self, path: str, progress=None, content_hash=None):
         """
         Add a file to the OpenAI API for use in user data.
 
-        If a file with the same name already exists, it uses the existing file ID.
-        Otherwise, it uploads the file and stores the new file ID.
+        Files already added in this session are matched by content hash. If a
+        file with the same name already exists, it uses the existing file ID.
+        Otherwise, it streams the file from disk and stores the new file ID.
 
         Args:
             path (str): The file path to add
+            progress (callable, optional): Called with (bytes_sent, total_bytes)
+                while the file is uploaded
+            content_hash (str, optional): Known content hash of the file, saves
+                hashing it again
 
         Returns:
-            None: The file ID is appended to the internal file_id_list
+            str: The file ID, which is also appended to the internal file_id_list
         """
-        file_id = self.get_file_id(os.path.basename(path))
+        if content_hash is None:
+            content_hash = hash_file(path)
+        file_id = self.file_cache.get(content_hash)
+        if file_id is None:
+            file_id = self.get_file_id(os.path.basename(path))
         if file_id is None:
             # If the file doesn't exist, upload it
-            with open(path, "rb") as file:
-                file_id = self.client.files.create(
-                    file=file,
+            with ProgressFile(path, progress) as file:
+                file_id = self.upload_guard.call(
+                    self.client.files.create,
+                    file=(os.path.basename(path), file),
                     purpose="user_data",
                 ).id
+        self.file_cache[content_hash] = file_id
         self.file_id_list.append(file_id)
+        return file_id
 
     def get_file_id(self, filename: str):
         """
@@ -50,7 +98,7 @@ class OpenAIClient:
         Returns:
             str or None: The ID of the file if found, None otherwise
         """
-        files = self.client.files.list()
+        files = self.list_files_guard.call(self.client.files.list)
         for data in files.data:
             if data.filename == filename:
                 return data.id
@@ -59,24 +107,55 @@ class OpenAIClient:
     def generate(self, prompt: str):
         """
         Generate a response from the OpenAI API using the provided prompt.
+
+        The request is dispatched through the configured backends, failing over
+        to the next one on errors and optionally hedging slow requests.
         Args:
             prompt (str): The prompt to generate a response for
         Returns:
             str: The generated response from the OpenAI API
         """
+        return self.generate_choices(prompt, 1)[0]
+
+    def generate_many(self, prompt: str, n: int):
+        """
+        Generate several independent quizzes in a single request.
+
+        The file parts and system prompt are sent once and the model returns
+        n choices. Questions that already appeared in an earlier quiz are
+        removed, and quizzes left without questions are dropped.
+        Args:
+            prompt (str): The prompt to generate quizzes for
+            n (int): The number of quizzes to generate
+        Returns:
+            list: The parsed quizzes
+        """
+        if n < 1:
+            raise ValueError("Number of quizzes must be at least 1")
 
+        return parse_quizzes(self.generate_choices(prompt, n))
+
+    def generate_choices(self, prompt: str, n: int, file_ids=None):
+        """
+        Generate n choices for the prompt without parsing them.
+        Args:
+            prompt (str): The prompt to generate responses for
+            n (int): The number of choices to generate
+            file_ids (list, optional): Files to attach instead of file_id_list
+        Returns:
+            list: The raw JSON string of each choice
+        """
         if not prompt:
             raise ValueError("Prompt cannot be empty")
 
-        if "json" not in prompt.lower():
-            prompt += "  Returnera svaret i giltigt JSON-format med hjälp av funktionen create_quiz. Kategorin ska vara 'ORD'."
-
         user_messages = {
             "role": "user",
             "content": [],
         }
 
-        for file_id in self.file_id_list:
+        if file_ids is None:
+            file_ids = self.file_id_list
+        for file_id in file_ids:
             user_messages["content"].append(
                 {"type": "file", "file": {"file_id": file_id}}
             )
@@ -86,7 +165,7 @@ class OpenAIClient:
         messages = [
             {
                 "role": "system",
-                "content": "Du är en hjälpsam assistent som skapar quiz i JSON-format.",
+                "content": SYSTEM_PROMPT,
             },
             user_messages,
         ]
@@ -128,17 +207,21 @@ class OpenAIClient:
             }
         ]
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            response_format={"type": "json_object"},
-            functions=functions,
-            function_call={"name": "create_quiz"},
-            max_tokens=int(os.getenv("MAX_TOKENS", 1000)),
-            temperature=float(os.getenv("TEMPERATURE", 0.7)),
-        )
-
-        return response.choices[0].message.function_call.arguments
+        choices = []
+        while len(choices) < n:
+            # Some OpenAI-compatible servers ignore n and return a single
+            # choice, so the remainder is requested again
+            batch = self.router.complete(
+                messages=messages,
+                functions=functions,
+                max_tokens=int(os.getenv("MAX_TOKENS", 1000)),
+                temperature=float(os.getenv("TEMPERATURE", 0.7)),
+                n=n - len(choices),
+            )
+            if not batch:
+                raise BackendError("Generation backend returned no choices")
+            choices += batch
+        return choices[:n]
 
 
 class QuizAPIClient:
@@ -147,23 +230,89 @@ class QuizAPIClient:
         self.auth_token = os.getenv("AUTH_TOKEN")
         if not self.api_route or not self.auth_token:
             raise ValueError("API route and auth token are required")
+        self.timeout = float(os.getenv("QUIZ_TIMEOUT", 30))
+        self.guard = UpstreamGuard("quiz-api")
 
-    def create_quiz(self, quiz_data):
+    def create_quiz(self, quiz_data, idempotency_key=None):
         """
         Create a quiz using the provided quiz data.
+
+        When an idempotency key is given it is sent in the Idempotency-Key
+        header. This is a contract with the quiz backend, not standard HTTP:
+        a backend that already stored a quiz under the key answers 304, 409
+        or 412 and echoes the header instead of storing a duplicate. The same
+        codes without the echoed key, e.g. a 409 for a duplicate title, raise
+        QuizAPIError. Backends that ignore the header store the quiz again.
+        Nothing is printed, since quizzes are posted from pipeline worker
+        threads.
         Args:
             quiz_data (dict): The quiz data to create
+            idempotency_key (str, optional): Content hash identifying the quiz
+        Returns:
+            requests.Response: The response from the quiz route
+        """
+        return self.guard.call(self._post, quiz_data, idempotency_key)
+
+    def sync(self, quizzes, manifest):
         """
+        Send only the quizzes that the backend has not acknowledged yet.
+
+        Each quiz is identified by its canonical content hash. Quizzes found
+        in the manifest are skipped, and every acknowledgement is saved to the
+        manifest right away so an interrupted sync does not resend them.
+        Quizzes the backend reports as already stored count as skipped.
+        Args:
+            quizzes (list): The quizzes to sync
+            manifest (SyncManifest): Record of previously acknowledged quizzes
+        Returns:
+            dict: Number of quizzes "sent" and "skipped"
+        """
+        summary = {"sent": 0, "skipped": 0}
+        for quiz_data in quizzes:
+            content_hash = canonical_hash(quiz_data)
+            if manifest.contains(content_hash):
+                summary["skipped"] += 1
+                continue
+            response = self.create_quiz(quiz_data, idempotency_key=content_hash)
+            manifest.record(
+                content_hash,
+                status_code=response.status_code,
+                response=_acknowledgement(response),
+            )
+            if response.status_code in ALREADY_STORED:
+                summary["skipped"] += 1
+            else:
+                summary["sent"] += 1
+        return summary
+
+    def _post(self, quiz_data, idempotency_key=None):
+        headers = {
+            "Authorization": f"Bearer {self.auth_token}",
+            "Content-Type": "application/json",
+        }
+        if idempotency_key is not None:
+            headers[IDEMPOTENCY_HEADER] = idempotency_key
         response = requests.post(
             self.api_route,
             json=quiz_data,
-            headers={
-                "Authorization": f"Bearer {self.auth_token}",
-                "Content-Type": "application/json",
-            },
+            headers=headers,
+            timeout=self.timeout,
+        )
+        already_stored = (
+            response.status_code in ALREADY_STORED
+            and idempotency_key is not None
+            and response.headers.get(IDEMPOTENCY_HEADER) == idempotency_key
         )
-        if response.status_code != 200:
-            raise Exception(f"API call failed with status code {response.status_code}")
+        if response.status_code != 200 and not already_stored:
+            raise QuizAPIError(response.status_code)
+        return response
 
-        print("Status Code:", response.status_code)
-        print("Response:", response.json())
+
+def _acknowledgement(response):
+    # The server's answer, e.g. the ID of the stored quiz; 304 has no body
+    if not response.content:
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
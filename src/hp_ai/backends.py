@@ -0,0 +1,247 @@
+import json
+import os
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from openai import OpenAI
+
+from .limits import UpstreamGuard
+
+
+class BackendError(Exception):
+    """Raised when every configured generation backend failed."""
+
+
+class GenerationBackend(ABC):
+    """
+    Base class for chat completion providers used by OpenAIClient.generate.
+
+    Subclasses implement complete() and return the raw function call arguments
+    (a JSON string) of each choice produced by the model. Backends may return
+    fewer than n choices.
+    """
+
+    name = "backend"
+
+    @abstractmethod
+    def complete(
+        self, messages, functions, max_tokens: int, temperature: float, n: int = 1
+    ):
+        """Return the raw function call arguments of up to n choices."""
+
+
+class OpenAIBackend(GenerationBackend):
+    name = "openai"
+
+    def __init__(self, client: OpenAI, model: str):
+        self.client = client
+        self.model = model
+
+    def complete(
+        self, messages, functions, max_tokens: int, temperature: float, n: int = 1
+    ):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            response_format={"type": "json_object"},
+            functions=functions,
+            function_call={"name": functions[0]["name"]},
+            max_tokens=max_tokens,
+            temperature=temperature,
+            n=n,
+        )
+        return [choice.message.function_call.arguments for choice in response.choices]
+
+
+class LocalBackend(OpenAIBackend):
+    """
+    Backend for a local server exposing an OpenAI-compatible chat API,
+    e.g. vLLM, llama.cpp or Ollama.
+    """
+
+    name = "local"
+
+    def __init__(self, base_url: str, model: str, api_key=None):
+        super().__init__(OpenAI(base_url=base_url, api_key=api_key or "local"), model)
+
+
+class FakeBackend(GenerationBackend):
+    """
+    Deterministic backend for tests and dry runs.
+
+    Returns the same quiz for the same prompt without any network access.
+    """
+
+    name = "fake"
+
+    def __init__(self, response=None, delay: float = 0.0, error=None):
+        self.response = response
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def complete(
+        self, messages, functions, max_tokens: int, temperature: float, n: int = 1
+    ):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        if self.response is not None:
+            return [self.response] * n
+
+        prompt = messages[-1]["content"][-1]["text"]
+        return [self._quiz(prompt, index) for index in range(n)]
+
+    def _quiz(self, prompt, index):
+        return json.dumps(
+            {
+                "title": f"Quiz {zlib.crc32(prompt.encode()) % 10000:04d}",
+                "category": "ORD",
+                "questions": [
+                    {
+                        "question": f"{prompt[:40]} ({index + 1})",
+                        "image": None,
+                        "alternatives": [
+                            {"option_text": "A", "is_correct": True},
+                            {"option_text": "B", "is_correct": False},
+                        ],
+                    }
+                ],
+            },
+            ensure_ascii=False,
+        )
+
+
+class LatencyTracker:
+    """Keeps a window of recent call latencies to derive the hedging delay."""
+
+    def __init__(self, window: int = 100, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct: float, default: float):
+        """
+        Return the given percentile of the recorded latencies.
+
+        Args:
+            pct (float): Percentile between 0 and 100
+            default (float): Value returned until enough samples are recorded
+
+        Returns:
+            float: The percentile in seconds
+        """
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return default
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+
+class BackendRouter:
+    """
+    Dispatches completions to a list of backends.
+
+    Backends are tried in order and the next one is used when a call raises
+    (failover). With hedging enabled, a second request is issued on the next
+    backend once the primary has been running longer than the observed p95
+    latency, and whichever finishes first wins.
+
+    Every backend call goes through its own UpstreamGuard, so an overloaded
+    provider is throttled and a provider that is down is skipped immediately.
+    """
+
+    def __init__(self, backends, hedge: bool = False, hedge_delay: float = 15.0):
+        if not backends:
+            raise ValueError("At least one generation backend is required")
+        self.backends = list(backends)
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.latency = LatencyTracker()
+        self.guards = {backend: UpstreamGuard(backend.name) for backend in backends}
+
+    def complete(self, **request):
+        if not self.hedge:
+            return self._complete_with_failover(self.backends, request)
+        return self._complete_hedged(request)
+
+    def _complete_with_failover(self, backends, request):
+        errors = []
+        for backend in backends:
+            start = time.monotonic()
+            try:
+                result = self.guards[backend].call(backend.complete, **request)
+            except Exception as e:
+                errors.append(f"{backend.name}: {e}")
+                continue
+            self.latency.record(time.monotonic() - start)
+            return result
+        raise BackendError(f"All generation backends failed ({'; '.join(errors)})")
+
+    def _complete_hedged(self, request):
+        delay = self.latency.percentile(95, default=self.hedge_delay)
+        primary = self._spawn(self._complete_with_failover, self.backends, request)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        # The slow request cannot be cancelled once in flight, so it is left to
+        # finish in the background and its result is discarded.
+        rotated = self.backends[1:] + self.backends[:1]
+        hedged = self._spawn(self._complete_with_failover, rotated, request)
+        pending = {primary, hedged}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    @staticmethod
+    def _spawn(func, *args):
+        # Every request gets its own thread rather than a slot in a shared
+        # pool, so slow primaries that cannot be cancelled never make new
+        # requests queue, which would count against the hedging delay
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="hp-ai-hedge", daemon=True).start()
+        return future
+
+
+def default_backends(client: OpenAI, model: str):
+    """
+    Build the backend list from the environment.
+
+    The OpenAI backend is always first. A local OpenAI-compatible server is
+    added as failover target when LOCAL_BASE_URL is set.
+    """
+    backends = [OpenAIBackend(client, model)]
+    base_url = os.getenv("LOCAL_BASE_URL")
+    if base_url:
+        backends.append(
+            LocalBackend(
+                base_url,
+                os.getenv("LOCAL_MODEL_NAME", model),
+                os.getenv("LOCAL_API_KEY"),
+            )
+        )
+    return backends
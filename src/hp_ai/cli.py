@@ -1,8 +1,34 @@
 import argparse
 import os
+import threading
 
 import questionary
 
+PIPELINE_STAGES = ("upload", "generate", "validate", "post")
+PROGRESS_STEP = 25
+
+_output_lock = threading.Lock()
+
+
+def _positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def _worker_counts(value):
+    workers = {}
+    for part in value.split(","):
+        stage, _, count = part.partition("=")
+        stage = stage.strip()
+        if stage not in PIPELINE_STAGES:
+            raise argparse.ArgumentTypeError(
+                f'Unknown stage "{stage}", expected one of {", ".join(PIPELINE_STAGES)}'
+            )
+        workers[stage] = _positive_int(count)
+    return workers
+
 
 class CLIHandler:
     def __init__(self):
@@ -27,6 +53,54 @@ class CLIHandler:
             default="./prompts.toml",
             type=str,
         )
+        parser.add_argument(
+            "-n",
+            "--count",
+            help="Number of quizzes to generate in one request, default is 1",
+            default=1,
+            type=_positive_int,
+        )
+        parser.add_argument(
+            "-s",
+            "--sweep",
+            help="Run one job for every parameter combination in the prompt's sweep",
+            action="store_true",
+        )
+        parser.add_argument(
+            "-w",
+            "--workers",
+            help="Override the workers per pipeline stage, e.g. generate=4,post=2",
+            default={},
+            type=_worker_counts,
+        )
+        parser.add_argument(
+            "-j",
+            "--journal",
+            help="Path to the job journal, default is .hp-ai-journal.jsonl",
+            default="./.hp-ai-journal.jsonl",
+            type=str,
+        )
+        parser.add_argument(
+            "-r",
+            "--resume",
+            help="Skip work already completed according to the job journal",
+            action="store_true",
+        )
+        parser.add_argument(
+            "-m",
+            "--manifest",
+            help="Path to the sync manifest of uploaded quizzes, default is .hp-ai-sync.jsonl",
+            default="./.hp-ai-sync.jsonl",
+            type=str,
+        )
+        parser.add_argument(
+            "--profile",
+            help="Write per-stage profiling reports to PROFILE_DIR, default is ./profile",
+            nargs="?",
+            const="./profile",
+            default=None,
+            metavar="PROFILE_DIR",
+        )
         return parser.parse_args()
 
     def _validate_arguments(self):
@@ -50,6 +124,27 @@ class CLIHandler:
     def get_prompt_file(self):
         return self.args.prompt_file
 
+    def get_count(self):
+        return self.args.count
+
+    def get_manifest_file(self):
+        return self.args.manifest
+
+    def get_profile_dir(self):
+        return self.args.profile
+
+    def get_sweep(self):
+        return self.args.sweep
+
+    def get_workers(self):
+        return self.args.workers
+
+    def get_journal_file(self):
+        return self.args.journal
+
+    def get_resume(self):
+        return self.args.resume
+
     def select_documents(self, documents):
         return questionary.checkbox(
             "Select documents to process",
@@ -66,3 +161,30 @@ class CLIHandler:
         return questionary.confirm(
             message=message,
         ).ask()
+
+    def upload_progress(self, filename):
+        """
+        Create a progress callback for uploading one file.
+
+        Progress is printed as a full line every PROGRESS_STEP percent, so
+        several files uploading at once do not overwrite each other.
+
+        Args:
+            filename (str): The file being uploaded
+
+        Returns:
+            callable: Called with the bytes sent so far and the total size
+        """
+        reported = None
+
+        def report(sent, total):
+            nonlocal reported
+            percent = sent * 100 // total if total else 100
+            step = percent // PROGRESS_STEP
+            if step == reported:
+                return
+            reported = step
+            with _output_lock:
+                print(f"Uploading {filename}: {percent}%", flush=True)
+
+        return report
@@ -1,22 +1,260 @@
+import hashlib
+import io
+import itertools
+import json
+import mmap
 import os
+import string
+from concurrent.futures import ThreadPoolExecutor
 
 import tomllib
 
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(path, block_size=HASH_BLOCK_SIZE):
+    """
+    Compute the SHA-256 digest of a file without reading it into memory.
+
+    Each block is memory-mapped on its own and unmapped once hashed, so only
+    one block is ever resident and memory use stays flat regardless of the
+    file size. The block size is rounded up to the mmap allocation
+    granularity so every window starts at a valid offset.
+
+    Args:
+        path (str): The file to hash
+        block_size (int): Number of bytes hashed per block
+
+    Returns:
+        str: The hex digest of the file content
+    """
+    granularity = mmap.ALLOCATIONGRANULARITY
+    block_size = -(-block_size // granularity) * granularity
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        for offset in range(0, size, block_size):
+            with mmap.mmap(
+                file.fileno(),
+                min(block_size, size - offset),
+                offset=offset,
+                access=mmap.ACCESS_READ,
+            ) as mapped:
+                digest.update(mapped)
+    return digest.hexdigest()
+
+
+def hash_files(paths, max_workers=None):
+    """
+    Hash several files in parallel.
+
+    hashlib releases the GIL while hashing large blocks, so threads scale
+    across cores.
+
+    Args:
+        paths (list): The files to hash
+        max_workers (int, optional): Number of hashing threads
+
+    Returns:
+        dict: Mapping of path to hex digest
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(paths, executor.map(hash_file, paths)))
+
+
+def read_json_lines(path):
+    """
+    Read the entries of a JSON lines file, oldest first.
+
+    A missing file has no entries, and a torn last line is skipped.
+
+    Args:
+        path (str): The file to read
+
+    Returns:
+        list: The decoded entries
+    """
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding="utf-8") as lines_file:
+        for line in lines_file:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A crash can leave a partially written last line
+                continue
+    return entries
+
+
+def append_json_line(path, entry):
+    """
+    Append one entry to a JSON lines file and flush it to disk.
+
+    Callers writing from several threads must hold their own lock.
+
+    Args:
+        path (str): The file to append to
+        entry (dict): The entry to write
+    """
+    with open(path, "a", encoding="utf-8") as lines_file:
+        lines_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        lines_file.flush()
+        os.fsync(lines_file.fileno())
+
+
+class ProgressFile(io.FileIO):
+    """
+    Read-only file that reports how many bytes have been read.
+
+    Passed to an upload in place of a regular file object, the HTTP client
+    streams it from disk in chunks and progress is reported per chunk.
+    """
+
+    def __init__(self, path, callback=None):
+        super().__init__(path, "rb")
+        self.total = os.fstat(self.fileno()).st_size
+        self.sent = 0
+        self.callback = callback
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.sent += len(chunk)
+        if self.callback is not None and chunk:
+            self.callback(self.sent, self.total)
+        return chunk
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        position = super().seek(offset, whence)
+        # Retried uploads rewind the file and start over
+        self.sent = position
+        return position
+
 
 class PromptManager:
+    """
+    Loads prompts from a TOML file.
+
+    A prompt is either a plain string or a table with a template using
+    $variables, optional defaults for the variables and an optional sweep
+    mapping variables to lists of values:
+
+        [hp_sweep]
+        template = "Skapa $questions $difficulty frågor i kategorin '$section'."
+        defaults = { questions = 10 }
+        sweep = { section = ["ORD", "LÄS"], difficulty = ["lätt", "svår"] }
+
+    Templates are compiled once when the file is loaded, and the file is
+    reloaded when its modification time changes.
+    """
+
     def __init__(self, prompt_file):
         self.prompt_file = prompt_file
-        self.prompts = self._load_prompts()
+        self.mtime = self._get_mtime()
+        self.prompts, self.templates = self._load()
+
+    def _get_mtime(self):
+        try:
+            return os.stat(self.prompt_file).st_mtime_ns
+        except OSError:
+            return None
 
     def _load_prompts(self):
         with open(self.prompt_file, "rb") as prompt_file:
             return tomllib.load(prompt_file)
 
+    def _load(self):
+        prompts = self._load_prompts()
+        return prompts, self._compile_templates(prompts)
+
+    @staticmethod
+    def _compile_templates(prompts):
+        templates = {}
+        for name, prompt in prompts.items():
+            if not isinstance(prompt, dict):
+                continue
+            if not isinstance(prompt.get("template"), str):
+                raise ValueError(f'Prompt "{name}" needs a template string')
+            for variable, values in prompt.get("sweep", {}).items():
+                if not isinstance(values, list):
+                    raise ValueError(
+                        f'Sweep value "{variable}" of prompt "{name}" must be a list'
+                    )
+            templates[name] = string.Template(prompt["template"])
+        return templates
+
+    def reload_if_changed(self):
+        """
+        Reload the prompt file if it changed on disk since it was loaded.
+
+        The new prompts only replace the current ones once the whole file has
+        loaded and compiled. If it fails, e.g. because it is half saved, the
+        error is reported and the previous prompts stay in use until the file
+        changes again.
+
+        Returns:
+            bool: True if the prompts were reloaded
+        """
+        mtime = self._get_mtime()
+        if mtime is None or mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        try:
+            prompts, templates = self._load()
+        except (OSError, ValueError) as e:
+            # ValueError covers TOMLDecodeError and invalid templates
+            print(f"Could not reload {self.prompt_file}, keeping previous prompts: {e}")
+            return False
+        self.prompts, self.templates = prompts, templates
+        return True
+
     def get_prompt_names(self):
+        self.reload_if_changed()
         return list(self.prompts.keys())
 
-    def get_prompt(self, prompt_name):
-        return self.prompts[prompt_name]
+    def get_prompt(self, prompt_name, **params):
+        """
+        Get a prompt, rendering its template with the given parameters.
+
+        Args:
+            prompt_name (str): The name of the prompt
+            **params: Template variables, overriding the prompt defaults
+
+        Returns:
+            str: The prompt text
+        """
+        self.reload_if_changed()
+        prompt = self.prompts[prompt_name]
+        if not isinstance(prompt, dict):
+            return prompt
+        variables = {**prompt.get("defaults", {}), **params}
+        try:
+            return self.templates[prompt_name].substitute(variables)
+        except KeyError as e:
+            raise ValueError(
+                f'Prompt "{prompt_name}" is missing a value for {e}'
+            ) from None
+
+    def expand_sweep(self, prompt_name):
+        """
+        Expand the sweep of a prompt into one prompt per parameter combination.
+
+        Args:
+            prompt_name (str): The name of the prompt
+
+        Returns:
+            list: (params, prompt) tuples for every combination of sweep values,
+                or a single tuple with empty params if the prompt has no sweep
+        """
+        self.reload_if_changed()
+        prompt = self.prompts[prompt_name]
+        sweep = prompt.get("sweep", {}) if isinstance(prompt, dict) else {}
+        names = list(sweep)
+        jobs = []
+        for values in itertools.product(*(sweep[name] for name in names)):
+            params = dict(zip(names, values))
+            jobs.append((params, self.get_prompt(prompt_name, **params)))
+        return jobs
 
 
 class DocumentManager:
@@ -36,3 +274,17 @@ class DocumentManager:
 
     def get_document_path(self, filename):
         return os.path.join(self.doc_folder, filename)
+
+    def get_document_hashes(self, filenames):
+        """
+        Get content hashes for documents, hashing them in parallel.
+
+        Args:
+            filenames (list): Document filenames relative to the document folder
+
+        Returns:
+            list: Hex digests in the same order as filenames
+        """
+        paths = [self.get_document_path(filename) for filename in filenames]
+        hashes = hash_files(paths)
+        return [hashes[path] for path in paths]
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import threading
+import time
+
+from .io import append_json_line, read_json_lines
+
+
+class JobJournal:
+    """
+    Write-ahead journal of generation jobs.
+
+    Every state change of a job is appended as one JSON line and flushed to
+    disk before the run continues, so an interrupted run can be resumed from
+    the last completed step of each job.
+    """
+
+    STATES = ("uploaded", "generated", "validated", "posted")
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.jobs = self._replay() if resume else {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def job_id(documents, prompt, params=None):
+        """
+        Derive a stable ID for a job from its inputs.
+
+        Args:
+            documents (list): The documents used as source material
+            prompt (str): The prompt used for generation
+            params (dict, optional): Additional generation parameters
+
+        Returns:
+            str: Hex digest identifying the job
+        """
+        key = json.dumps(
+            {"documents": list(documents), "prompt": prompt, "params": params or {}},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _replay(self):
+        jobs = {}
+        for entry in read_json_lines(self.path):
+            jobs.setdefault(entry["job_id"], {}).update(entry)
+        return jobs
+
+    def _append(self, entry):
+        with self._lock:
+            append_json_line(self.path, entry)
+            self.jobs.setdefault(entry["job_id"], {}).update(entry)
+
+    def record(self, job_id, state, **data):
+        """
+        Record that a job reached a state.
+
+        Args:
+            job_id (str): The job ID
+            state (str): One of STATES
+            **data: Data needed to resume from this state, e.g. file IDs or
+                the generated choices
+        """
+        if state not in self.STATES:
+            raise ValueError(f'Unknown job state "{state}"')
+        self._append(
+            {"job_id": job_id, "state": state, "error": None, "ts": time.time(), **data}
+        )
+
+    def record_failure(self, job_id, error):
+        """Record an error for a job without moving it out of its last state."""
+        self._append({"job_id": job_id, "error": str(error), "ts": time.time()})
+
+    def get(self, job_id):
+        return self.jobs.get(job_id, {})
+
+    def reached(self, job_id, state):
+        """
+        Check whether a job has completed the given state.
+
+        Args:
+            job_id (str): The job ID
+            state (str): One of STATES
+
+        Returns:
+            bool: True if the job is at the given state or a later one
+        """
+        current = self.get(job_id).get("state")
+        if current is None:
+            return False
+        return self.STATES.index(current) >= self.STATES.index(state)
@@ -0,0 +1,221 @@
+import threading
+import time
+
+import openai
+import requests
+
+# Upper bound on concurrent calls to one upstream
+MAX_CONCURRENCY = 64
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the upstream circuit is open."""
+
+
+def _status_code(exc):
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(exc, "response", None), "status_code", None)
+    return status_code
+
+
+def is_overload(exc):
+    """
+    Check whether an exception signals that the upstream is overloaded.
+
+    Rate limits (429), server errors (5xx) and timeouts count as overload.
+
+    Args:
+        exc (Exception): The exception raised by the upstream call
+
+    Returns:
+        bool: True if the caller should back off
+    """
+    if isinstance(
+        exc, (TimeoutError, openai.APITimeoutError, requests.exceptions.Timeout)
+    ):
+        return True
+    status_code = _status_code(exc)
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+def is_upstream_failure(exc):
+    """
+    Check whether an exception means the upstream itself is failing.
+
+    Client side errors such as a missing file or an invalid request do not
+    count, so they never trip the circuit breaker.
+    """
+    return is_overload(exc) or isinstance(
+        exc, (ConnectionError, openai.APIConnectionError, requests.ConnectionError)
+    )
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limiter.
+
+    The number of allowed in-flight calls grows by roughly one per window of
+    successful calls while latency is healthy, and is halved whenever the
+    upstream signals overload. The limit only grows while it is what holds
+    calls back, i.e. when a call finishes with the limit filled, so it stays
+    within one of the real concurrency and a backoff always bites.
+
+    Latency is healthy while a short-term EWMA stays within latency_tolerance
+    of a slowly decaying long-term EWMA. Both adapt to the upstream's normal
+    latency, so calls that are always slow, or vary a lot from call to call,
+    do not keep shrinking the limit; only a sustained rise does.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = MAX_CONCURRENCY,
+        latency_tolerance: float = 2.0,
+        backoff: float = 0.5,
+        short_alpha: float = 0.3,
+        long_alpha: float = 0.02,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self.short_alpha = short_alpha
+        self.long_alpha = long_alpha
+        self.short_latency = None
+        self.long_latency = None
+        self.samples = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency: float):
+        with self._condition:
+            self.samples += 1
+            if self.long_latency is None:
+                self.short_latency = self.long_latency = latency
+            else:
+                # The long-term average is a plain mean until it has enough
+                # samples, so it does not stay anchored to the first call
+                long_alpha = max(self.long_alpha, 1 / self.samples)
+                self.short_latency += self.short_alpha * (latency - self.short_latency)
+                self.long_latency += long_alpha * (latency - self.long_latency)
+            # Counted after release, so this call is added back
+            saturated = self.in_flight + 1 >= int(self.limit)
+            if self.short_latency <= self.long_latency * self.latency_tolerance:
+                if saturated:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            else:
+                # Latency is rising before any errors show up; ease off gently
+                self.limit = max(self.min_limit, self.limit * 0.9)
+            self._condition.notify_all()
+
+    def on_overload(self):
+        with self._condition:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+
+
+class CircuitBreaker:
+    """
+    Fails fast while an upstream is down.
+
+    After failure_threshold consecutive upstream failures the circuit opens and
+    calls are rejected with CircuitOpenError. Once reset_timeout seconds have
+    passed a single trial call is let through; its outcome closes or reopens
+    the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"Circuit for {self.name} is open")
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError(f"Circuit for {self.name} is half open")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def record_ignored(self):
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class UpstreamGuard:
+    """Combines an AdaptiveLimiter and a CircuitBreaker around calls to one upstream."""
+
+    def __init__(self, name: str, limiter=None, breaker=None):
+        self.name = name
+        self.limiter = limiter or AdaptiveLimiter()
+        self.breaker = breaker or CircuitBreaker(name)
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call func under the concurrency limit and circuit breaker.
+
+        Args:
+            func (callable): The upstream call to make
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The return value of func
+        """
+        self.breaker.before_call()
+        self.limiter.acquire()
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if is_overload(e):
+                self.limiter.on_overload()
+            if is_upstream_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_ignored()
+            raise
+        finally:
+            self.limiter.release()
+        self.limiter.on_success(time.monotonic() - start)
+        self.breaker.record_success()
+        return result
@@ -0,0 +1,337 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import quiz
+from .limits import MAX_CONCURRENCY
+
+# Stages calling an upstream get as many workers as its limiter may ever allow,
+# so the UpstreamGuard, not the worker count, decides how many calls run at once
+DEFAULT_WORKERS = {
+    "upload": MAX_CONCURRENCY,
+    "generate": MAX_CONCURRENCY,
+    "validate": 1,
+    "post": MAX_CONCURRENCY,
+}
+
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a pipeline.
+
+    func is a blocking callable taking one item. It returns the item to pass
+    on, a list of items to fan out, or None to drop the item.
+    """
+
+    def __init__(self, name: str, func, workers: int = 1):
+        if workers < 1:
+            raise ValueError(f'Stage "{name}" needs at least one worker')
+        self.name = name
+        self.func = func
+        self.workers = workers
+
+
+class PipelineSummary:
+    def __init__(self, stages):
+        self.stages = stages
+        self.processed = {stage.name: 0 for stage in stages}
+        self.busy = {stage.name: 0.0 for stage in stages}
+        self.failures = []
+        self.results = []
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, stage_name, seconds, item=None, error=None):
+        with self._lock:
+            self.busy[stage_name] += seconds
+            if error is None:
+                self.processed[stage_name] += 1
+            else:
+                self.failures.append((stage_name, item, error))
+
+    def format(self):
+        lines = [f"Pipeline finished in {self.elapsed:.1f}s"]
+        for stage in self.stages:
+            failed = sum(1 for name, _, _ in self.failures if name == stage.name)
+            lines.append(
+                f"  {stage.name:<10} workers {stage.workers}  "
+                f"processed {self.processed[stage.name]}  failed {failed}  "
+                f"busy {self.busy[stage.name]:.1f}s"
+            )
+        for name, item, error in self.failures:
+            lines.append(f"  {name} failed for {describe(item)}: {error}")
+        return "\n".join(lines)
+
+
+def describe(item):
+    if isinstance(item, dict):
+        return item.get("label") or item.get("filename") or item.get("job_id")
+    return repr(item)
+
+
+class Pipeline:
+    """
+    Streams items through stages connected by bounded asyncio queues.
+
+    Each stage runs its own number of workers, and blocking stage functions
+    run in a thread pool. Bounded queues give backpressure, so a slow stage
+    holds back the stages before it instead of letting work pile up, and the
+    total run time approaches that of the slowest stage. A failing item is
+    recorded in the summary and dropped without stopping the other items.
+    """
+
+    def __init__(self, stages, queue_size: int = 8):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = queue_size
+
+    def run(self, items):
+        """
+        Run items through all stages concurrently.
+
+        Args:
+            items (list): The items fed to the first stage
+
+        Returns:
+            PipelineSummary: Counts, timings, failures and the items that came
+                out of the last stage
+        """
+        return asyncio.run(self._run(items))
+
+    def run_sequential(self, items, stage_context):
+        """
+        Run every item through one stage before starting the next.
+
+        Used for profiling, where stage_context(name) wraps each stage.
+
+        Args:
+            items (list): The items fed to the first stage
+            stage_context (callable): Returns a context manager for a stage name
+
+        Returns:
+            PipelineSummary: The same summary as run()
+        """
+        summary = PipelineSummary(self.stages)
+        start = time.monotonic()
+        for stage in self.stages:
+            outputs = []
+            with stage_context(stage.name):
+                for item in items:
+                    outputs += self._process(stage, item, summary)
+            items = outputs
+        summary.results = items
+        summary.elapsed = time.monotonic() - start
+        return summary
+
+    def _process(self, stage, item, summary):
+        start = time.monotonic()
+        try:
+            result = stage.func(item)
+        except Exception as e:
+            summary.record(stage.name, time.monotonic() - start, item, e)
+            return []
+        summary.record(stage.name, time.monotonic() - start)
+        if result is None:
+            return []
+        return result if isinstance(result, list) else [result]
+
+    async def _run(self, items):
+        summary = PipelineSummary(self.stages)
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(
+            max_workers=sum(stage.workers for stage in self.stages),
+            thread_name_prefix="hp-ai-pipeline",
+        )
+        start = time.monotonic()
+
+        async def feed():
+            for item in items:
+                await queues[0].put(item)
+            for _ in range(self.stages[0].workers):
+                await queues[0].put(_DONE)
+
+        async def worker(index):
+            stage = self.stages[index]
+            while True:
+                item = await queues[index].get()
+                if item is _DONE:
+                    return
+                outputs = await loop.run_in_executor(
+                    executor, self._process, stage, item, summary
+                )
+                for output in outputs:
+                    if index + 1 < len(self.stages):
+                        await queues[index + 1].put(output)
+                    else:
+                        summary.results.append(output)
+
+        async def run_stage(index):
+            await asyncio.gather(
+                *(worker(index) for _ in range(self.stages[index].workers))
+            )
+            if index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1].workers):
+                    await queues[index + 1].put(_DONE)
+
+        try:
+            await asyncio.gather(
+                feed(), *(run_stage(index) for index in range(len(self.stages)))
+            )
+        finally:
+            executor.shutdown(wait=False)
+        summary.elapsed = time.monotonic() - start
+        return summary
+
+
+class QuizJobs:
+    """
+    Pipeline stages for generating quizzes from documents.
+
+    Items entering the upload stage are documents, each carrying the jobs
+    (one per prompt) that use it. After the upload every job flows through
+    generation and validation on its own. Posting is a separate pass over
+    the validated jobs, so the quizzes can be reviewed first. Every step is
+    recorded in the job journal and completed steps are skipped when resuming.
+    Stage functions never print; their outcome is reported through the
+    pipeline summary and the items they return. Upload progress goes to the
+    progress callback, which must be safe to call from several threads.
+
+    progress, if given, is called with a filename and returns the upload
+    progress callback for that file.
+    """
+
+    def __init__(
+        self,
+        document_manager,
+        job_journal,
+        count: int,
+        client=None,
+        quiz_client=None,
+        manifest=None,
+        progress=None,
+    ):
+        self.document_manager = document_manager
+        self.journal = job_journal
+        self.count = count
+        self.client = client
+        self.quiz_client = quiz_client
+        self.manifest = manifest
+        self.progress = progress
+
+    def stages(self, workers=None):
+        """
+        Build the stages that generate and validate quizzes.
+
+        The post stage is only included when a quiz client is configured;
+        leave it out to review the quizzes before running post_stages().
+
+        Args:
+            workers (dict, optional): Worker count per stage name, overriding
+                DEFAULT_WORKERS
+
+        Returns:
+            list: The stages in order
+        """
+        workers = {**DEFAULT_WORKERS, **(workers or {})}
+        stages = [
+            Stage("upload", self.upload, workers["upload"]),
+            Stage("generate", self.generate, workers["generate"]),
+            Stage("validate", self.validate, workers["validate"]),
+        ]
+        if self.quiz_client is not None:
+            stages.append(Stage("post", self.post, workers["post"]))
+        return stages
+
+    def post_stages(self, workers=None):
+        """
+        Build the stage that posts already validated jobs.
+
+        Args:
+            workers (dict, optional): Worker count per stage name, overriding
+                DEFAULT_WORKERS
+
+        Returns:
+            list: The post stage
+        """
+        if self.quiz_client is None:
+            raise ValueError("Posting needs a quiz client")
+        workers = {**DEFAULT_WORKERS, **(workers or {})}
+        return [Stage("post", self.post, workers["post"])]
+
+    def upload(self, document):
+        jobs = document["jobs"]
+        file_ids = next(
+            (
+                self.journal.get(job["job_id"])["file_ids"]
+                for job in jobs
+                if self.journal.reached(job["job_id"], "uploaded")
+            ),
+            None,
+        )
+        needs_generation = any(
+            not self.journal.reached(job["job_id"], "generated") for job in jobs
+        )
+        if file_ids is None and needs_generation:
+            path = self.document_manager.get_document_path(document["filename"])
+            progress = None
+            if self.progress is not None:
+                progress = self.progress(document["filename"])
+            file_ids = [
+                self.client.add_file(path, progress, content_hash=document.get("hash"))
+            ]
+        for job in jobs:
+            if file_ids is not None and not self.journal.reached(
+                job["job_id"], "uploaded"
+            ):
+                self.journal.record(job["job_id"], "uploaded", file_ids=file_ids)
+            job["file_ids"] = file_ids
+        return jobs
+
+    def generate(self, job):
+        if self.journal.reached(job["job_id"], "generated"):
+            job["choices"] = self.journal.get(job["job_id"])["choices"]
+            return job
+        try:
+            choices = self.client.generate_choices(
+                job["prompt"], self.count, job["file_ids"]
+            )
+        except Exception as e:
+            self.journal.record_failure(job["job_id"], e)
+            raise
+        self.journal.record(job["job_id"], "generated", choices=choices)
+        job["choices"] = choices
+        return job
+
+    def validate(self, job):
+        try:
+            quizzes = quiz.parse_quizzes(job["choices"])
+            for json_result in quizzes:
+                quiz.validate_quiz(json_result)
+        except ValueError as e:
+            # Roll back to the upload so a resumed run generates the job again
+            # instead of reloading the same invalid result
+            self.journal.record(
+                job["job_id"],
+                "uploaded",
+                file_ids=self.journal.get(job["job_id"]).get("file_ids"),
+            )
+            self.journal.record_failure(job["job_id"], e)
+            raise
+        if not self.journal.reached(job["job_id"], "validated"):
+            self.journal.record(job["job_id"], "validated")
+        job["quizzes"] = quizzes
+        return job
+
+    def post(self, job):
+        try:
+            job["sync"] = self.quiz_client.sync(job["quizzes"], self.manifest)
+        except Exception as e:
+            self.journal.record_failure(job["job_id"], e)
+            raise
+        self.journal.record(job["job_id"], "posted")
+        return job
@@ -0,0 +1,185 @@
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+COLLAPSED_FILE = "profile.collapsed"
+MAX_STACK_DEPTH = 64
+
+_DISABLED = nullcontext()
+
+
+def _frame_label(func):
+    filename, lineno, name = func
+    if filename == "~":
+        label = name
+    else:
+        label = f"{name} ({os.path.basename(filename)}:{lineno})"
+    return label.replace(";", ",")
+
+
+def collapse_stats(stats, prefix):
+    """
+    Convert cProfile statistics into collapsed stack lines.
+
+    cProfile records caller/callee pairs rather than full stacks. Following
+    every path through the call graph grows exponentially, so each function is
+    instead placed under the stack of its heaviest caller (memoized, cycles
+    cut), and its self time is split between its callers as recorded per
+    caller/callee pair. This gives one line per pair and runs in linear time.
+    The output can be fed to flamegraph.pl or speedscope.
+
+    Args:
+        stats (pstats.Stats): The profile statistics
+        prefix (str): Frame prepended to every stack, e.g. the stage name
+
+    Returns:
+        list: Lines of the form "frame;frame;frame microseconds"
+    """
+    entries = stats.stats
+
+    heaviest_caller = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        candidates = [
+            (edge[3], caller)
+            for caller, edge in callers.items()
+            if caller in entries and caller != func
+        ]
+        if candidates:
+            heaviest_caller[func] = max(candidates, key=lambda item: item[0])[1]
+
+    paths = {}
+
+    def push(path, label):
+        # Frames right below the prefix are dropped first, so deep stacks keep
+        # the stage they belong to
+        return [path[0]] + (path[1:] + [label])[-(MAX_STACK_DEPTH - 1) :]
+
+    def path_to(func):
+        # Iterative walk up the heaviest-caller chain, stopping at a cycle,
+        # a function whose path is already known, or the depth limit
+        chain = []
+        seen = set()
+        current = func
+        while (
+            current is not None
+            and current not in paths
+            and current not in seen
+            and len(chain) < MAX_STACK_DEPTH
+        ):
+            seen.add(current)
+            chain.append(current)
+            current = heaviest_caller.get(current)
+        path = paths.get(current, [prefix]) if current is not None else [prefix]
+        for node in reversed(chain):
+            path = push(path, _frame_label(node))
+            paths[node] = path
+        return paths[func]
+
+    totals = {}
+
+    def add(stack, seconds):
+        microseconds = seconds * 1e6
+        if microseconds >= 1:
+            key = ";".join(stack)
+            totals[key] = totals.get(key, 0) + microseconds
+
+    for func, (_, _, self_time, _, callers) in entries.items():
+        label = _frame_label(func)
+        attributed = 0.0
+        for caller, edge in callers.items():
+            if caller not in entries:
+                continue
+            add(push(path_to(caller), label), edge[2])
+            attributed += edge[2]
+        # Time not recorded against a known caller, e.g. for root functions
+        add(path_to(func), self_time - attributed)
+
+    return [f"{stack} {round(value)}" for stack, value in totals.items()]
+
+
+class StageProfiler:
+    """
+    Profiles named stages of a run with cProfile and tracemalloc.
+
+    For each stage a binary .prof file, a text report with the top functions
+    and allocation sites, and collapsed stacks in profile.collapsed are written
+    to output_dir. When output_dir is None, stage() returns a shared no-op
+    context manager so disabled profiling costs nothing.
+    """
+
+    def __init__(self, output_dir=None, top: int = 25):
+        self.output_dir = output_dir
+        self.top = top
+        self.stage_counts = {}
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+            # Start every run with a fresh collapsed stack file
+            open(os.path.join(output_dir, COLLAPSED_FILE), "w").close()
+
+    @property
+    def enabled(self):
+        return self.output_dir is not None
+
+    def stage(self, name: str):
+        """
+        Context manager profiling the code run inside it as one stage.
+
+        Args:
+            name (str): The stage name used in report file names
+
+        Returns:
+            A context manager
+        """
+        if not self.enabled:
+            return _DISABLED
+        return self._profile(name)
+
+    @contextmanager
+    def _profile(self, name):
+        count = self.stage_counts.get(name, 0) + 1
+        self.stage_counts[name] = count
+        if count > 1:
+            name = f"{name}-{count}"
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            self._write_reports(name, profile, snapshot, peak)
+
+    def _write_reports(self, name, profile, snapshot, peak):
+        profile.dump_stats(os.path.join(self.output_dir, f"{name}.prof"))
+
+        buffer = io.StringIO()
+        stats = pstats.Stats(profile, stream=buffer)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+
+        with open(
+            os.path.join(self.output_dir, f"{name}.txt"), "w", encoding="utf-8"
+        ) as report:
+            report.write(f"Stage: {name}\n")
+            report.write(f"Peak traced memory: {peak / 1024:.1f} KiB\n\n")
+            report.write("Top allocations by line:\n")
+            for statistic in snapshot.statistics("lineno")[: self.top]:
+                report.write(f"  {statistic}\n")
+            report.write("\n")
+            report.write(buffer.getvalue())
+
+        with open(
+            os.path.join(self.output_dir, COLLAPSED_FILE), "a", encoding="utf-8"
+        ) as collapsed:
+            for line in collapse_stats(stats, name):
+                collapsed.write(line + "\n")
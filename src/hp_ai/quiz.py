@@ -0,0 +1,90 @@
+import hashlib
+import json
+
+
+def validate_quiz(quiz):
+    """
+    Check that a generated quiz has the structure expected by the backend.
+
+    Args:
+        quiz (dict): The parsed quiz
+
+    Raises:
+        ValueError: If a required field is missing or a question has no
+            correct alternative
+    """
+    if not isinstance(quiz, dict):
+        raise ValueError("Quiz must be a JSON object")
+    for key in ("title", "category", "questions"):
+        if key not in quiz:
+            raise ValueError(f'Quiz is missing "{key}"')
+    for index, question in enumerate(quiz["questions"]):
+        if not question.get("question"):
+            raise ValueError(f"Question {index} has no text")
+        alternatives = question.get("alternatives") or []
+        if not any(alternative.get("is_correct") for alternative in alternatives):
+            raise ValueError(f"Question {index} has no correct alternative")
+
+
+def _question_key(question):
+    return " ".join(question.get("question", "").lower().split())
+
+
+def dedupe_questions(quizzes):
+    """
+    Remove questions that already appeared in an earlier quiz.
+
+    Questions are compared on their text, ignoring case and whitespace.
+    Quizzes that end up without any questions are dropped.
+
+    Args:
+        quizzes (list): The parsed quizzes
+
+    Returns:
+        list: The quizzes with overlapping questions removed
+    """
+    seen = set()
+    unique = []
+    for quiz in quizzes:
+        questions = []
+        for question in quiz.get("questions", []):
+            key = _question_key(question)
+            if key in seen:
+                continue
+            seen.add(key)
+            questions.append(question)
+        if questions:
+            unique.append({**quiz, "questions": questions})
+    return unique
+
+
+def parse_quizzes(choices):
+    """
+    Parse generated choices into quizzes and remove overlapping questions.
+
+    Args:
+        choices (list): The raw JSON string of each generated choice
+
+    Returns:
+        list: The parsed quizzes
+
+    Raises:
+        ValueError: If a choice is not valid JSON
+    """
+    return dedupe_questions([json.loads(choice) for choice in choices])
+
+
+def canonical_hash(quiz):
+    """
+    Hash a quiz independently of key order and formatting.
+
+    Args:
+        quiz (dict): The quiz
+
+    Returns:
+        str: Hex digest of the canonical JSON encoding
+    """
+    canonical = json.dumps(
+        quiz, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
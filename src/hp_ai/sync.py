@@ -0,0 +1,50 @@
+import threading
+import time
+
+from .io import append_json_line, read_json_lines
+
+
+class SyncManifest:
+    """
+    Maps quiz content hashes to the acknowledgement from the quiz backend.
+
+    Acknowledgements are appended as JSON lines and flushed immediately, so
+    an interrupted sync never resends quizzes that were already accepted.
+    Every entry records the route it was sent to, and only entries for the
+    given route are loaded, so one manifest can serve several backends, e.g.
+    staging and production.
+    """
+
+    def __init__(self, path, route):
+        self.path = path
+        self.route = route
+        self.entries = self._load()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        return {
+            entry["hash"]: entry
+            for entry in read_json_lines(self.path)
+            if entry.get("route") == self.route
+        }
+
+    def contains(self, content_hash):
+        return content_hash in self.entries
+
+    def record(self, content_hash, **acknowledgement):
+        """
+        Store the acknowledgement for a quiz.
+
+        Args:
+            content_hash (str): Canonical content hash of the quiz
+            **acknowledgement: Details from the response, e.g. status_code
+        """
+        entry = {
+            "hash": content_hash,
+            "route": self.route,
+            **acknowledgement,
+            "ts": time.time(),
+        }
+        with self._lock:
+            append_json_line(self.path, entry)
+            self.entries[content_hash] = entry
@@ -1,11 +1,11 @@
 import os
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import openai_responses
 import pytest
 from openai_responses import OpenAIMock
 
-from src.hp_ai.api import OpenAIClient
+from src.hp_ai.api import SYSTEM_PROMPT, OpenAIClient
 
 
 @openai_responses.mock()
@@ -44,3 +44,50 @@ def test_generate() -> None:
     # Test with empty prompt
     with pytest.raises(ValueError):
         client.generate("")
+
+
+def test_generate_choices_keeps_prompt() -> None:
+    """Test that the prompt is sent unchanged, without a forced category."""
+    client = OpenAIClient(api_key="test_api_key", model="gpt-4o-mini")
+    client.router = Mock()
+    client.router.complete.return_value = ["{}"]
+
+    client.generate_choices("Skapa frågor i kategorin 'LÄS'.", 1, file_ids=[])
+
+    messages = client.router.complete.call_args.kwargs["messages"]
+    assert messages[0] == {"role": "system", "content": SYSTEM_PROMPT}
+    assert messages[1]["content"] == [
+        {"type": "text", "text": "Skapa frågor i kategorin 'LÄS'."}
+    ]
+
+
+@openai_responses.mock()
+def test_add_file_streams_upload(openai_mock: OpenAIMock, tmp_path) -> None:
+    """Test that uploads report progress and identical content is uploaded once."""
+    path = tmp_path / "document.pdf"
+    path.write_bytes(b"%PDF" + b"x" * 1000)
+    reports = []
+    client = OpenAIClient(api_key="test_api_key", model="gpt-4o-mini")
+
+    first = client.add_file(
+        str(path), progress=lambda sent, total: reports.append(sent)
+    )
+    second = client.add_file(str(path))
+
+    assert first == second
+    assert reports[-1] == 1004
+    assert openai_mock.files.create.route.call_count == 1
+
+
+@openai_responses.mock()
+def test_add_file_with_known_hash(tmp_path) -> None:
+    """Test that a known content hash is used instead of hashing the file again."""
+    path = tmp_path / "document.pdf"
+    path.write_bytes(b"%PDF")
+    client = OpenAIClient(api_key="test_api_key", model="gpt-4o-mini")
+
+    with patch("src.hp_ai.api.hash_file") as mock_hash_file:
+        file_id = client.add_file(str(path), content_hash="known")
+
+    mock_hash_file.assert_not_called()
+    assert client.file_cache["known"] == file_id
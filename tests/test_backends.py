@@ -0,0 +1,127 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.hp_ai.api import OpenAIClient
+from src.hp_ai.backends import (
+    BackendError,
+    BackendRouter,
+    FakeBackend,
+    GenerationBackend,
+)
+
+
+def test_fake_backend_is_deterministic() -> None:
+    """Test that the fake backend returns the same quiz for the same prompt."""
+    client = OpenAIClient(api_key="test_api_key", backends=[FakeBackend()])
+
+    first = client.generate("Skapa en json quiz")
+    second = client.generate("Skapa en json quiz")
+
+    assert first == second
+    assert json.loads(first)["questions"]
+
+
+def test_failover_to_next_backend() -> None:
+    """Test that a failing backend falls over to the next one."""
+    failing = FakeBackend(error=RuntimeError("provider down"))
+    fallback = FakeBackend(response='{"title": "ok"}')
+    client = OpenAIClient(api_key="test_api_key", backends=[failing, fallback])
+
+    assert client.generate("json") == '{"title": "ok"}'
+    assert failing.calls == 1
+    assert fallback.calls == 1
+
+
+def test_all_backends_failing() -> None:
+    """Test that an error is raised when every backend fails."""
+    router = BackendRouter(
+        [FakeBackend(error=RuntimeError("a")), FakeBackend(error=RuntimeError("b"))]
+    )
+
+    with pytest.raises(BackendError, match="All generation backends failed"):
+        router.complete(messages=[], functions=[], max_tokens=1, temperature=0)
+
+
+def test_hedged_request_uses_fastest_backend() -> None:
+    """Test that a slow primary is hedged by a request to the next backend."""
+    slow = FakeBackend(response='"slow"', delay=1.0)
+    fast = FakeBackend(response='"fast"')
+    router = BackendRouter([slow, fast], hedge=True, hedge_delay=0.05)
+
+    result = router.complete(messages=[], functions=[], max_tokens=1, temperature=0)
+
+    assert result == ['"fast"']
+    assert fast.calls == 1
+
+
+def test_router_requires_backends() -> None:
+    """Test that a router cannot be created without backends."""
+    with pytest.raises(ValueError):
+        BackendRouter([])
+
+
+def test_generate_many() -> None:
+    """Test that several quizzes are generated in a single backend call."""
+    backend = FakeBackend()
+    client = OpenAIClient(api_key="test_api_key", backends=[backend])
+
+    quizzes = client.generate_many("json", 3)
+
+    assert len(quizzes) == 3
+    assert backend.calls == 1
+
+
+def test_generate_many_dedupes_questions() -> None:
+    """Test that identical choices collapse into a single quiz."""
+    backend = FakeBackend(response=FakeBackend()._quiz("json", 0))
+    client = OpenAIClient(api_key="test_api_key", backends=[backend])
+
+    assert len(client.generate_many("json", 3)) == 1
+
+
+def test_generate_many_tops_up_missing_choices() -> None:
+    """Test that backends ignoring n are called again for the remainder."""
+
+    class SingleChoiceBackend(FakeBackend):
+        def complete(self, messages, functions, max_tokens, temperature, n=1):
+            return super().complete(messages, functions, max_tokens, temperature)
+
+    backend = SingleChoiceBackend(response='{"title": "t", "questions": []}')
+    client = OpenAIClient(api_key="test_api_key", backends=[backend])
+
+    client.generate_many("json", 3)
+
+    assert backend.calls == 3
+
+
+def test_backend_interface_is_abstract() -> None:
+    """Test that backends must implement complete()."""
+    with pytest.raises(TypeError):
+        GenerationBackend()
+
+
+def test_stuck_primaries_do_not_delay_hedges() -> None:
+    """Test that many slow primaries in flight do not hold back new requests."""
+    slow = FakeBackend(response='"slow"', delay=1.0)
+    fast = FakeBackend(response='"fast"')
+    router = BackendRouter([slow, fast], hedge=True, hedge_delay=0.05)
+    # Enough concurrent calls to exhaust a small fixed thread pool
+    router.guards[slow].limiter.limit = 32
+    router.guards[fast].limiter.limit = 32
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(
+            pool.map(
+                lambda _: router.complete(
+                    messages=[], functions=[], max_tokens=1, temperature=0
+                ),
+                range(16),
+            )
+        )
+
+    assert results == [['"fast"']] * 16
+    assert time.monotonic() - start < 0.9
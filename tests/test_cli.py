@@ -320,3 +320,19 @@ class TestCLIHandler:
                 # Verify handler initialized correctly with real files
                 assert cli_handler.get_document_folder() == temp_dir
                 assert cli_handler.get_prompt_file() == prompt_file
+
+    def test_upload_progress_prints_whole_lines(self, capsys) -> None:
+        """Test that progress of concurrent uploads is printed as separate lines."""
+        cli_handler = CLIHandler.__new__(CLIHandler)
+        first = cli_handler.upload_progress("a.pdf")
+        second = cli_handler.upload_progress("b.pdf")
+
+        for sent in range(0, 101, 10):
+            first(sent, 100)
+            second(sent, 100)
+
+        output = capsys.readouterr().out
+        assert "\r" not in output
+        assert output.splitlines()[:2] == ["Uploading a.pdf: 0%", "Uploading b.pdf: 0%"]
+        assert output.count("Uploading a.pdf") == 5
+        assert output.splitlines()[-1] == "Uploading b.pdf: 100%"
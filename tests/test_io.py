@@ -1,11 +1,32 @@
+import hashlib
 import os
+import subprocess
+import sys
 import tempfile
 from unittest import mock
 
 import pytest
 from tomllib import TOMLDecodeError
 
-from src.hp_ai.io import DocumentManager, PromptManager
+from src.hp_ai.io import (
+    DocumentManager,
+    ProgressFile,
+    PromptManager,
+    hash_file,
+)
+
+# Prints how much the peak RSS (VmHWM, in KiB) grows while hashing a file
+RSS_SCRIPT = """
+import sys
+from src.hp_ai.io import hash_file
+def peak():
+    with open("/proc/self/status") as status:
+        line = next(line for line in status if line.startswith("VmHWM:"))
+    return int(line.split()[1])
+before = peak()
+hash_file(sys.argv[1])
+print(peak() - before)
+"""
 
 
 class TestPromptManager:
@@ -87,6 +108,103 @@ invalid_toml = "unclosed string
             # Clean up
             os.unlink(temp_file_path)
 
+    def test_template_prompt(self, tmp_path) -> None:
+        """Test rendering a templated prompt with defaults and overrides."""
+        path = tmp_path / "prompts.toml"
+        path.write_text(
+            """
+[sektion]
+template = "Skapa $questions frågor för $section"
+defaults = { questions = 5, section = "ORD" }
+""",
+            encoding="utf-8",
+        )
+
+        pm = PromptManager(str(path))
+
+        assert pm.get_prompt("sektion") == "Skapa 5 frågor för ORD"
+        assert pm.get_prompt("sektion", section="LÄS") == "Skapa 5 frågor för LÄS"
+
+    def test_template_missing_variable(self, tmp_path) -> None:
+        """Test that a template variable without a value is reported."""
+        path = tmp_path / "prompts.toml"
+        path.write_text('[sektion]\ntemplate = "Delprov $section"\n')
+
+        with pytest.raises(ValueError, match="section"):
+            PromptManager(str(path)).get_prompt("sektion")
+
+    def test_expand_sweep(self, tmp_path) -> None:
+        """Test that a sweep expands into every parameter combination."""
+        path = tmp_path / "prompts.toml"
+        path.write_text(
+            """
+plain = "Plain prompt"
+
+[sektion]
+template = "$section $difficulty"
+sweep = { section = ["ORD", "LÄS"], difficulty = ["lätt", "svår"] }
+""",
+            encoding="utf-8",
+        )
+        pm = PromptManager(str(path))
+
+        jobs = pm.expand_sweep("sektion")
+
+        assert len(jobs) == 4
+        assert ({"section": "LÄS", "difficulty": "svår"}, "LÄS svår") in jobs
+        assert pm.expand_sweep("plain") == [({}, "Plain prompt")]
+
+    def test_reload_on_change(self, tmp_path) -> None:
+        """Test that prompts are reloaded when the file modification time changes."""
+        path = tmp_path / "prompts.toml"
+        path.write_text('prompt = "First"\n')
+        pm = PromptManager(str(path))
+
+        path.write_text('prompt = "Second"\nother = "Other"\n')
+        os.utime(path, ns=(pm.mtime + 10**9, pm.mtime + 10**9))
+
+        assert pm.get_prompt("prompt") == "Second"
+        assert set(pm.get_prompt_names()) == {"prompt", "other"}
+
+    def test_failed_reload_keeps_previous_prompts(self, tmp_path, capsys) -> None:
+        """Test that an invalid edit neither breaks nor half-replaces the prompts."""
+        path = tmp_path / "prompts.toml"
+        path.write_text('[sektion]\ntemplate = "Delprov $section"\n')
+        pm = PromptManager(str(path))
+
+        for step, content in enumerate(
+            ['[sektion]\ndefaults = { section = "ORD" }\n', '[sektion]\ntemplate = "'],
+            start=1,
+        ):
+            path.write_text(content)
+            os.utime(path, ns=(pm.mtime + step * 10**9, pm.mtime + step * 10**9))
+
+            assert pm.get_prompt("sektion", section="ORD") == "Delprov ORD"
+            assert "keeping previous prompts" in capsys.readouterr().out
+
+        path.write_text('[sektion]\ntemplate = "Prov $section"\n')
+        os.utime(path, ns=(pm.mtime + 10**9, pm.mtime + 10**9))
+
+        assert pm.get_prompt("sektion", section="ORD") == "Prov ORD"
+
+    def test_table_without_template(self, tmp_path) -> None:
+        """Test that a prompt table without a template is rejected on load."""
+        path = tmp_path / "prompts.toml"
+        path.write_text('[sektion]\ndefaults = { section = "ORD" }\n')
+
+        with pytest.raises(ValueError, match="sektion"):
+            PromptManager(str(path))
+
+    def test_scalar_sweep_value(self, tmp_path) -> None:
+        """Test that a sweep value that is not a list is rejected on load."""
+        path = tmp_path / "prompts.toml"
+        path.write_text(
+            '[sektion]\ntemplate = "$section"\nsweep = { section = "ORD" }\n'
+        )
+
+        with pytest.raises(ValueError, match="sektion"):
+            PromptManager(str(path))
+
 
 class TestDocumentManager:
     def test_init(self) -> None:
@@ -143,3 +261,82 @@ class TestDocumentManager:
         # Should raise FileNotFoundError when trying to list the directory
         with pytest.raises(FileNotFoundError):
             dm.get_documents()
+
+
+class TestHashing:
+    def test_hash_file_matches_hashlib(self) -> None:
+        """Test that block-wise mmap hashing equals hashing the whole content."""
+        content = os.urandom(10_000)
+        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+            temp_file.write(content)
+            temp_file_path = temp_file.name
+
+        try:
+            assert (
+                hash_file(temp_file_path, block_size=1024)
+                == hashlib.sha256(content).hexdigest()
+            )
+        finally:
+            os.unlink(temp_file_path)
+
+    def test_hash_empty_file(self) -> None:
+        """Test hashing a file that cannot be memory-mapped."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "empty.txt")
+            open(path, "w").close()
+
+            assert hash_file(path) == hashlib.sha256(b"").hexdigest()
+
+    @pytest.mark.skipif(
+        not os.path.exists("/proc/self/status"), reason="needs Linux procfs"
+    )
+    def test_hash_file_keeps_memory_flat(self, tmp_path) -> None:
+        """Test that peak RSS does not grow with the size of the hashed file."""
+        path = tmp_path / "large.bin"
+        with open(path, "wb") as large_file:
+            large_file.writelines(bytes([index]) * (1024 * 1024) for index in range(64))
+
+        # A fresh process, since the peak RSS is a high-water mark
+        output = subprocess.run(
+            [sys.executable, "-c", RSS_SCRIPT, str(path)],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout
+        growth_kib = int(output)
+
+        assert growth_kib < 16 * 1024
+
+    def test_get_document_hashes(self) -> None:
+        """Test that documents are hashed in the requested order."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in ("a.txt", "b.txt"):
+                with open(os.path.join(temp_dir, name), "w") as f:
+                    f.write(name)
+
+            dm = DocumentManager(temp_dir)
+
+            assert dm.get_document_hashes(["b.txt", "a.txt"]) == [
+                hashlib.sha256(b"b.txt").hexdigest(),
+                hashlib.sha256(b"a.txt").hexdigest(),
+            ]
+
+
+class TestProgressFile:
+    def test_reports_progress(self) -> None:
+        """Test that reads are reported and a rewind restarts the count."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "doc.pdf")
+            with open(path, "wb") as f:
+                f.write(b"x" * 100)
+            reports = []
+
+            with ProgressFile(path, lambda sent, total: reports.append(sent)) as file:
+                while file.read(40):
+                    pass
+                assert reports == [40, 80, 100]
+                assert file.total == 100
+
+                file.seek(0)
+                assert file.sent == 0
@@ -0,0 +1,60 @@
+import os
+import tempfile
+
+import pytest
+
+from src.hp_ai.journal import JobJournal
+
+
+class TestJobJournal:
+    def test_job_id_is_stable(self) -> None:
+        """Test that the same inputs give the same job ID."""
+        first = JobJournal.job_id(["a.pdf"], "prompt", {"n": 1})
+        second = JobJournal.job_id(["a.pdf"], "prompt", {"n": 1})
+        other = JobJournal.job_id(["a.pdf"], "prompt", {"n": 2})
+
+        assert first == second
+        assert first != other
+
+    def test_resume_replays_states(self) -> None:
+        """Test that a resumed journal restores the last state of each job."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "journal.jsonl")
+            journal = JobJournal(path)
+            journal.record("job", "uploaded", file_ids=["file-1"])
+            journal.record("job", "generated", choices=['{"title": "t"}'])
+            journal.record_failure("job", "validation failed")
+
+            resumed = JobJournal(path, resume=True)
+
+            assert resumed.get("job")["file_ids"] == ["file-1"]
+            assert resumed.get("job")["choices"] == ['{"title": "t"}']
+            assert resumed.get("job")["error"] == "validation failed"
+            assert resumed.reached("job", "generated")
+            assert not resumed.reached("job", "validated")
+
+    def test_without_resume_starts_empty(self) -> None:
+        """Test that previous runs are ignored unless resuming."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "journal.jsonl")
+            JobJournal(path).record("job", "posted")
+
+            assert not JobJournal(path).reached("job", "uploaded")
+            assert JobJournal(path, resume=True).reached("job", "posted")
+
+    def test_torn_last_line_is_ignored(self) -> None:
+        """Test that a partially written entry does not break resuming."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "journal.jsonl")
+            JobJournal(path).record("job", "uploaded", file_ids=[])
+            with open(path, "a") as journal_file:
+                journal_file.write('{"job_id": "job", "sta')
+
+            assert JobJournal(path, resume=True).reached("job", "uploaded")
+
+    def test_unknown_state(self) -> None:
+        """Test that unknown states are rejected."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            journal = JobJournal(os.path.join(temp_dir, "journal.jsonl"))
+            with pytest.raises(ValueError):
+                journal.record("job", "done")
@@ -0,0 +1,183 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from src.hp_ai.api import QuizAPIError
+from src.hp_ai.limits import (
+    AdaptiveLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    UpstreamGuard,
+    is_overload,
+)
+
+
+def complete_saturated(limiter, latency, count):
+    """Complete calls one at a time while every other slot is in flight."""
+    for _ in range(count):
+        slots = int(limiter.limit)
+        for _ in range(slots):
+            limiter.acquire()
+        limiter.release()
+        limiter.on_success(latency)
+        for _ in range(slots - 1):
+            limiter.release()
+
+
+class TestAdaptiveLimiter:
+    def test_grows_while_latency_is_healthy(self) -> None:
+        """Test that the limit increases additively on healthy calls."""
+        limiter = AdaptiveLimiter(initial=2)
+
+        complete_saturated(limiter, 0.1, 10)
+
+        assert limiter.limit > 2
+
+    def test_does_not_grow_beyond_real_concurrency(self) -> None:
+        """Test that calls that never fill the limit do not raise it."""
+        limiter = AdaptiveLimiter(initial=4)
+
+        for _ in range(30):
+            limiter.acquire()
+            limiter.release()
+            limiter.on_success(0.1)
+
+        assert limiter.limit == 4
+
+    def test_backs_off_on_overload(self) -> None:
+        """Test that the limit is cut multiplicatively on overload."""
+        limiter = AdaptiveLimiter(initial=8)
+
+        limiter.on_overload()
+        assert limiter.limit == 4
+
+        for _ in range(10):
+            limiter.on_overload()
+        assert limiter.limit == limiter.min_limit
+
+    def test_eases_off_on_slow_calls(self) -> None:
+        """Test that rising latency lowers the limit before errors appear."""
+        limiter = AdaptiveLimiter(initial=8)
+        for _ in range(50):
+            limiter.on_success(0.1)
+        before = limiter.limit
+
+        for _ in range(3):
+            limiter.on_success(1.0)
+
+        assert limiter.limit < before
+
+    def test_mixed_latencies_do_not_collapse_the_limit(self) -> None:
+        """Test that latency varying call to call still lets the limit grow."""
+        limiter = AdaptiveLimiter(initial=4)
+
+        for index in range(200):
+            # Alternate quick list calls with multi-second uploads
+            complete_saturated(limiter, 0.1 if index % 2 else 3.0, 1)
+
+        assert limiter.limit > 4
+
+    def test_baseline_adapts_to_slower_upstream(self) -> None:
+        """Test that a lasting latency shift is absorbed by the baseline."""
+        limiter = AdaptiveLimiter(initial=8)
+        for _ in range(50):
+            limiter.on_success(0.1)
+
+        for _ in range(300):
+            limiter.on_success(1.0)
+        shifted = limiter.limit
+        complete_saturated(limiter, 1.0, 20)
+
+        assert limiter.limit > shifted
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self) -> None:
+        """Test that the circuit opens and rejects calls after failures."""
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_half_open_trial_closes_circuit(self) -> None:
+        """Test that a successful trial call closes the circuit again."""
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        breaker.record_success()
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+class TestUpstreamGuard:
+    def test_overload_errors_trip_breaker(self) -> None:
+        """Test that 5xx errors back off the limiter and count as failures."""
+        guard = UpstreamGuard(
+            "test", breaker=CircuitBreaker("test", failure_threshold=1)
+        )
+        func = mock.Mock(side_effect=QuizAPIError(503))
+
+        with pytest.raises(QuizAPIError):
+            guard.call(func)
+        with pytest.raises(CircuitOpenError):
+            guard.call(func)
+
+        assert func.call_count == 1
+        assert guard.limiter.limit == 2
+
+    def test_client_errors_are_ignored(self) -> None:
+        """Test that client side errors do not trip the breaker."""
+        guard = UpstreamGuard(
+            "test", breaker=CircuitBreaker("test", failure_threshold=1)
+        )
+
+        with pytest.raises(FileNotFoundError):
+            guard.call(mock.Mock(side_effect=FileNotFoundError()))
+
+        assert guard.call(lambda: "ok") == "ok"
+        assert guard.limiter.in_flight == 0
+
+    def test_backoff_reduces_concurrency_below_workers(self) -> None:
+        """Test that after an overload fewer calls run than there are workers."""
+        guard = UpstreamGuard("test")
+        for _ in range(30):
+            guard.call(lambda: None)
+        guard.limiter.on_overload()
+
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def call():
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+
+        threads = [threading.Thread(target=guard.call, args=(call,)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert peak <= 2
+
+
+def test_is_overload() -> None:
+    """Test classification of upstream errors."""
+    assert is_overload(QuizAPIError(429))
+    assert is_overload(QuizAPIError(502))
+    assert is_overload(TimeoutError())
+    assert not is_overload(QuizAPIError(400))
+    assert not is_overload(ValueError())
@@ -0,0 +1,185 @@
+import time
+from unittest import mock
+
+import pytest
+
+from src.hp_ai.api import OpenAIClient
+from src.hp_ai.backends import FakeBackend
+from src.hp_ai.io import DocumentManager
+from src.hp_ai.journal import JobJournal
+from src.hp_ai.limits import AdaptiveLimiter
+from src.hp_ai.pipeline import Pipeline, QuizJobs, Stage
+
+
+class TestPipeline:
+    def test_items_flow_through_all_stages(self) -> None:
+        """Test that items pass every stage, including fan-out and drops."""
+        stages = [
+            Stage("split", lambda item: [item, item + 100]),
+            Stage("drop_odd", lambda item: item if item % 2 == 0 else None, 2),
+            Stage("double", lambda item: item * 2, 3),
+        ]
+
+        summary = Pipeline(stages, queue_size=1).run(range(4))
+
+        assert sorted(summary.results) == [0, 4, 200, 204]
+        assert summary.processed == {"split": 4, "drop_odd": 8, "double": 4}
+
+    def test_failures_do_not_stop_other_items(self) -> None:
+        """Test that a failing item is recorded and the rest continue."""
+
+        def check(item):
+            if item == 2:
+                raise ValueError("bad item")
+            return item
+
+        summary = Pipeline([Stage("check", check)]).run([1, 2, 3])
+
+        assert sorted(summary.results) == [1, 3]
+        assert len(summary.failures) == 1
+        assert "check failed for 2: bad item" in summary.format()
+
+    def test_stages_overlap(self) -> None:
+        """Test that stages run concurrently instead of one after another."""
+
+        def slow(item):
+            time.sleep(0.05)
+            return item
+
+        stages = [Stage("first", slow, 2), Stage("second", slow, 2)]
+
+        start = time.monotonic()
+        summary = Pipeline(stages).run(range(8))
+        elapsed = time.monotonic() - start
+
+        assert len(summary.results) == 8
+        # Sequential stages would take 0.4s
+        assert elapsed < 0.35
+
+    def test_run_sequential(self) -> None:
+        """Test that sequential runs wrap each stage in its context."""
+        entered = []
+
+        class Context:
+            def __init__(self, name):
+                self.name = name
+
+            def __enter__(self):
+                entered.append(self.name)
+
+            def __exit__(self, *exc_info):
+                return False
+
+        stages = [Stage("a", lambda item: item + 1), Stage("b", lambda item: item)]
+
+        summary = Pipeline(stages).run_sequential([1, 2], Context)
+
+        assert summary.results == [2, 3]
+        assert entered == ["a", "b"]
+
+
+def test_quiz_jobs_resume(tmp_path) -> None:
+    """Test that a resumed run only redoes the jobs that did not finish."""
+    (tmp_path / "doc.txt").write_text("text")
+    journal_path = str(tmp_path / "journal.jsonl")
+    backend = FakeBackend()
+    client = OpenAIClient(api_key="test_api_key", backends=[backend])
+    client.add_file = lambda path, progress=None, content_hash=None: "file-1"
+
+    def make_items():
+        return [
+            {
+                "filename": "doc.txt",
+                "jobs": [
+                    {"job_id": "first", "prompt": "json ett"},
+                    {"job_id": "second", "prompt": "json två"},
+                ],
+            }
+        ]
+
+    journal = JobJournal(journal_path)
+    quiz_jobs = QuizJobs(DocumentManager(str(tmp_path)), journal, 1, client)
+    summary = Pipeline(quiz_jobs.stages()).run(make_items())
+
+    assert len(summary.results) == 2
+    assert journal.reached("first", "validated")
+    assert backend.calls == 2
+
+    resumed = JobJournal(journal_path, resume=True)
+    quiz_jobs = QuizJobs(DocumentManager(str(tmp_path)), resumed, 1, client)
+    summary = Pipeline(quiz_jobs.stages()).run(make_items())
+
+    assert len(summary.results) == 2
+    assert backend.calls == 2
+
+
+def test_invalid_result_is_regenerated_on_resume(tmp_path) -> None:
+    """Test that a job failing validation is generated again when resuming."""
+    (tmp_path / "doc.txt").write_text("text")
+    journal_path = str(tmp_path / "journal.jsonl")
+    invalid = (
+        '{"title": "t", "category": "ORD", "questions": [{"question": "q", '
+        '"image": null, "alternatives": [{"option_text": "A", "is_correct": false}]}]}'
+    )
+    backend = FakeBackend(response=invalid)
+    client = OpenAIClient(api_key="test_api_key", backends=[backend])
+    client.add_file = lambda path, progress=None, content_hash=None: "file-1"
+
+    def run():
+        journal = JobJournal(journal_path, resume=True)
+        items = [{"filename": "doc.txt", "jobs": [{"job_id": "job", "prompt": "json"}]}]
+        quiz_jobs = QuizJobs(DocumentManager(str(tmp_path)), journal, 1, client)
+        return journal, Pipeline(quiz_jobs.stages()).run(items)
+
+    journal, summary = run()
+    assert len(summary.failures) == 1
+    assert not journal.reached("job", "generated")
+
+    backend.response = FakeBackend()._quiz("json", 0)
+    journal, summary = run()
+
+    assert backend.calls == 2
+    assert journal.reached("job", "validated")
+    assert journal.get("job")["file_ids"] == ["file-1"]
+
+
+def test_quizzes_are_posted_after_review(tmp_path) -> None:
+    """Test that posting is a separate pass over the validated jobs."""
+    (tmp_path / "doc.txt").write_text("text")
+    journal = JobJournal(str(tmp_path / "journal.jsonl"))
+    client = OpenAIClient(api_key="test_api_key", backends=[FakeBackend()])
+    client.add_file = lambda path, progress=None, content_hash=None: "file-1"
+    items = [{"filename": "doc.txt", "jobs": [{"job_id": "job", "prompt": "json"}]}]
+    quiz_jobs = QuizJobs(DocumentManager(str(tmp_path)), journal, 1, client)
+
+    stages = quiz_jobs.stages()
+    summary = Pipeline(stages).run(items)
+
+    assert [stage.name for stage in stages] == ["upload", "generate", "validate"]
+    assert journal.reached("job", "validated")
+    assert not journal.reached("job", "posted")
+    with pytest.raises(ValueError):
+        quiz_jobs.post_stages()
+
+    quiz_jobs.quiz_client = mock.Mock()
+    quiz_jobs.quiz_client.sync.return_value = {"sent": 1, "skipped": 0}
+    summary = Pipeline(quiz_jobs.post_stages()).run(summary.results)
+
+    assert summary.processed["post"] == 1
+    assert journal.reached("job", "posted")
+
+
+def test_upstream_stages_leave_concurrency_to_the_limiter() -> None:
+    """Test that default worker counts never cap the adaptive limiters."""
+    quiz_jobs = QuizJobs(None, None, 1, quiz_client=mock.Mock())
+    max_limit = AdaptiveLimiter().max_limit
+
+    workers = {stage.name: stage.workers for stage in quiz_jobs.stages()}
+    overridden = {
+        stage.name: stage.workers for stage in quiz_jobs.stages({"generate": 4})
+    }
+
+    assert workers["upload"] >= max_limit
+    assert workers["generate"] >= max_limit
+    assert workers["post"] >= max_limit
+    assert overridden["generate"] == 4
@@ -0,0 +1,105 @@
+import json
+import os
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+
+from src.hp_ai.profiling import (
+    COLLAPSED_FILE,
+    MAX_STACK_DEPTH,
+    StageProfiler,
+    collapse_stats,
+)
+
+
+def busy_work():
+    return sum(len(json.dumps({"value": index})) for index in range(2000))
+
+
+class TestStageProfiler:
+    def test_disabled_profiler_is_a_no_op(self) -> None:
+        """Test that disabled profiling writes nothing and reuses one context."""
+        profiler = StageProfiler()
+
+        with profiler.stage("scan"):
+            busy_work()
+
+        assert not profiler.enabled
+        assert profiler.stage("scan") is profiler.stage("post")
+
+    def test_writes_stage_reports(self) -> None:
+        """Test that each stage gets a .prof file, a report and collapsed stacks."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            profiler = StageProfiler(temp_dir)
+
+            with profiler.stage("parse"):
+                busy_work()
+            with profiler.stage("parse"):
+                busy_work()
+
+            files = set(os.listdir(temp_dir))
+            assert {"parse.prof", "parse.txt", "parse-2.prof", "parse-2.txt"} <= files
+
+            with open(os.path.join(temp_dir, "parse.txt")) as report:
+                content = report.read()
+            assert "Peak traced memory" in content
+            assert "busy_work" in content
+
+            with open(os.path.join(temp_dir, COLLAPSED_FILE)) as collapsed:
+                lines = collapsed.read().splitlines()
+            assert lines
+            for line in lines:
+                stack, value = line.rsplit(" ", 1)
+                assert stack.split(";")[0] in ("parse", "parse-2")
+                assert int(value) >= 1
+            assert any("busy_work" in line for line in lines)
+
+
+def dense_stats(functions=5000, callers_per_function=8, chain=100):
+    """
+    Build a pstats-like object with a densely connected, cyclic call graph and
+    a call chain deeper than MAX_STACK_DEPTH.
+    """
+    rng = random.Random(0)
+    funcs = [
+        (f"module{index % 50}.py", index, f"func{index}") for index in range(functions)
+    ]
+    entries = {}
+    for index, func in enumerate(funcs):
+        callers = {}
+        if index:
+            for caller in rng.sample(funcs[:index], min(index, callers_per_function)):
+                callers[caller] = (1, 1, 0.0001, 0.001)
+        # A few back edges create recursion cycles
+        if index % 100 == 0 and index + 1 < functions:
+            callers[funcs[index + 1]] = (1, 1, 0.0001, 0.001)
+        self_time = 0.0001 * len(callers) + 0.0005
+        entries[func] = (1, 1, self_time, 0.01, callers)
+    for index in range(chain):
+        func = ("chain.py", index, f"chain{index}")
+        callers = {}
+        if index:
+            callers[("chain.py", index - 1, f"chain{index - 1}")] = (1, 1, 0.001, 0.01)
+        entries[func] = (1, 1, 0.001, 0.01, callers)
+    return SimpleNamespace(stats=entries)
+
+
+class TestCollapseStats:
+    def test_realistic_profile_is_fast(self) -> None:
+        """Test that a large, dense call graph is collapsed in linear time."""
+        stats = dense_stats()
+
+        start = time.monotonic()
+        lines = collapse_stats(stats, "generate")
+        elapsed = time.monotonic() - start
+
+        assert elapsed < 5
+        total = sum(int(line.rsplit(" ", 1)[1]) for line in lines)
+        expected = sum(entry[2] for entry in stats.stats.values()) * 1e6
+        assert abs(total - expected) / expected < 0.01
+        for line in lines:
+            stack = line.rsplit(" ", 1)[0].split(";")
+            assert stack[0] == "generate"
+            assert len(stack) <= MAX_STACK_DEPTH
+        assert any("chain99" in line for line in lines)
@@ -0,0 +1,64 @@
+import pytest
+
+from src.hp_ai.quiz import canonical_hash, dedupe_questions, validate_quiz
+
+
+def make_quiz(is_correct=True):
+    return {
+        "title": "Quiz",
+        "category": "ORD",
+        "questions": [
+            {
+                "question": "Ord",
+                "image": None,
+                "alternatives": [
+                    {"option_text": "A", "is_correct": is_correct},
+                    {"option_text": "B", "is_correct": False},
+                ],
+            }
+        ],
+    }
+
+
+def test_validate_quiz() -> None:
+    """Test that a well formed quiz passes validation."""
+    validate_quiz(make_quiz())
+
+
+def test_validate_quiz_missing_field() -> None:
+    """Test that a quiz without questions is rejected."""
+    quiz = make_quiz()
+    del quiz["questions"]
+
+    with pytest.raises(ValueError, match='missing "questions"'):
+        validate_quiz(quiz)
+
+
+def test_validate_quiz_without_correct_answer() -> None:
+    """Test that a question without a correct alternative is rejected."""
+    with pytest.raises(ValueError, match="no correct alternative"):
+        validate_quiz(make_quiz(is_correct=False))
+
+
+def test_dedupe_questions() -> None:
+    """Test that overlapping questions are removed across quizzes."""
+    first = make_quiz()
+    second = make_quiz()
+    second["questions"][0]["question"] = "  ORD "
+    third = make_quiz()
+    third["questions"][0]["question"] = "Annat ord"
+
+    quizzes = dedupe_questions([first, second, third])
+
+    assert len(quizzes) == 2
+    assert quizzes[0]["questions"][0]["question"] == "Ord"
+    assert quizzes[1]["questions"][0]["question"] == "Annat ord"
+
+
+def test_canonical_hash_ignores_key_order() -> None:
+    """Test that equal quizzes hash the same regardless of key order."""
+    quiz = make_quiz()
+    reordered = {key: quiz[key] for key in reversed(list(quiz))}
+
+    assert canonical_hash(quiz) == canonical_hash(reordered)
+    assert canonical_hash(quiz) != canonical_hash(make_quiz(is_correct=False))
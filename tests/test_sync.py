@@ -0,0 +1,97 @@
+import os
+from unittest import mock
+
+import pytest
+
+from src.hp_ai.api import QuizAPIClient, QuizAPIError
+from src.hp_ai.quiz import canonical_hash
+from src.hp_ai.sync import SyncManifest
+
+ROUTE = "http://test/api/"
+QUIZ_ENV = {"QUIZ_ROUTE": ROUTE, "AUTH_TOKEN": "token"}
+
+
+def make_response(status_code, idempotency_key=None):
+    response = mock.Mock(status_code=status_code, headers={}, content=b'{"id": 1}')
+    if idempotency_key is not None:
+        response.headers["Idempotency-Key"] = idempotency_key
+    response.json.return_value = {"id": 1}
+    return response
+
+
+class TestSyncManifest:
+    def test_record_and_reload(self, tmp_path) -> None:
+        """Test that acknowledgements survive reloading the manifest."""
+        path = str(tmp_path / "sync.jsonl")
+        SyncManifest(path, ROUTE).record("abc", status_code=200)
+
+        manifest = SyncManifest(path, ROUTE)
+
+        assert manifest.contains("abc")
+        assert manifest.entries["abc"]["status_code"] == 200
+        assert not manifest.contains("def")
+
+    def test_entries_are_scoped_to_route(self, tmp_path) -> None:
+        """Test that quizzes synced to one backend are not skipped for another."""
+        path = str(tmp_path / "sync.jsonl")
+        SyncManifest(path, "http://staging/api/").record("abc", status_code=200)
+
+        assert not SyncManifest(path, "http://prod/api/").contains("abc")
+        assert SyncManifest(path, "http://staging/api/").contains("abc")
+
+    def test_missing_manifest_is_empty(self, tmp_path) -> None:
+        """Test that a new manifest starts empty."""
+        assert SyncManifest(str(tmp_path / "missing.jsonl"), ROUTE).entries == {}
+
+
+@mock.patch.dict(os.environ, QUIZ_ENV)
+class TestQuizAPIClientSync:
+    @mock.patch("requests.post")
+    def test_only_new_quizzes_are_sent(self, mock_post, tmp_path) -> None:
+        """Test that a re-sync only transfers quizzes not acknowledged before."""
+        mock_post.return_value = make_response(200)
+        manifest = SyncManifest(str(tmp_path / "sync.jsonl"), ROUTE)
+        client = QuizAPIClient()
+
+        first = client.sync([{"title": "a"}, {"title": "b"}], manifest)
+        second = client.sync([{"title": "b"}, {"title": "c"}], manifest)
+
+        assert first == {"sent": 2, "skipped": 0}
+        assert second == {"sent": 1, "skipped": 1}
+        assert mock_post.call_count == 3
+        headers = mock_post.call_args.kwargs["headers"]
+        assert headers["Idempotency-Key"] == canonical_hash({"title": "c"})
+        assert manifest.entries[canonical_hash({"title": "c"})]["response"] == {"id": 1}
+
+    @mock.patch("requests.post")
+    def test_not_modified_is_acknowledged(self, mock_post, tmp_path) -> None:
+        """Test that a quiz the backend already has is recorded, not an error."""
+        mock_post.return_value = make_response(412, canonical_hash({"title": "a"}))
+        manifest = SyncManifest(str(tmp_path / "sync.jsonl"), ROUTE)
+
+        summary = QuizAPIClient().sync([{"title": "a"}], manifest)
+
+        assert summary == {"sent": 0, "skipped": 1}
+        assert manifest.contains(canonical_hash({"title": "a"}))
+
+    @mock.patch("requests.post")
+    def test_failed_upload_is_not_recorded(self, mock_post, tmp_path) -> None:
+        """Test that failed uploads are retried on the next sync."""
+        mock_post.return_value = make_response(400)
+        manifest = SyncManifest(str(tmp_path / "sync.jsonl"), ROUTE)
+
+        with pytest.raises(QuizAPIError):
+            QuizAPIClient().sync([{"title": "a"}], manifest)
+
+        assert manifest.entries == {}
+
+    @mock.patch("requests.post")
+    def test_conflict_without_echoed_key_is_an_error(self, mock_post, tmp_path) -> None:
+        """Test that a 409 unrelated to the idempotency key is not recorded."""
+        mock_post.return_value = make_response(409)
+        manifest = SyncManifest(str(tmp_path / "sync.jsonl"), ROUTE)
+
+        with pytest.raises(QuizAPIError):
+            QuizAPIClient().sync([{"title": "a"}], manifest)
+
+        assert manifest.entries == {}